@@ -6,10 +6,12 @@ Import and use these functions in your API endpoints for database operations.
 """
 
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -17,6 +19,9 @@ load_dotenv()
 
 _client = None
 db = None
+# Async (Motor) handle for endpoints that await their Mongo I/O
+_async_client = None
+adb = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
@@ -24,10 +29,27 @@ database_name = os.getenv("DATABASE_NAME")
 if database_url and database_name:
     _client = MongoClient(database_url)
     db = _client[database_name]
+    _async_client = AsyncIOMotorClient(database_url)
+    adb = _async_client[database_name]
+
+class DatetimeToISODecoder(TypeDecoder):
+    """Decode BSON datetimes straight to ISO-8601 strings"""
+    bson_type = datetime
+
+    def transform_bson(self, value):
+        return value.isoformat()
+
+# Codec options for read-only listings: datetimes arrive as strings, ready to send
+ISO_DATETIME_OPTIONS = CodecOptions(type_registry=TypeRegistry([DatetimeToISODecoder()]))
 
 # Helper functions for common database operations
+def _stored_now() -> datetime:
+    """Current time as Mongo stores it and reads return it: naive UTC at millisecond precision"""
+    now = datetime.now(timezone.utc)
+    return now.replace(tzinfo=None, microsecond=now.microsecond // 1000 * 1000)
+
 def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+    """Insert a single document with timestamp and return it (including _id)"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
@@ -37,19 +59,57 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = _stored_now()
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+
+    db[collection_name].insert_one(data_dict)  # sets data_dict['_id']
+    return data_dict
+
+def create_documents(collection_name: str, data: List[dict]):
+    """Insert many documents with timestamps in one round-trip and return them (including _id)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = _stored_now()
+    docs = [{**d, 'created_at': now, 'updated_at': now} for d in data]
+    if docs:
+        db[collection_name].insert_many(docs)  # sets each doc's '_id'
+    return docs
 
-    result = db[collection_name].insert_one(data_dict)
-    return str(result.inserted_id)
+def ensure_indexes():
+    """Create the indexes the API queries rely on (idempotent)"""
+    if db is None:
+        return
+
+    db["shift"].create_index([("status", 1), ("date", 1)], name="status_date")
+    db["staff"].create_index([("is_active", 1), ("role", 1)])
+    db["caretask"].create_index([("resident_id", 1), ("assigned_to_staff_id", 1)])
+    # The compound index above cannot serve staff-only /tasks filters
+    db["caretask"].create_index([("assigned_to_staff_id", 1)])
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, codec_options: CodecOptions = None):
+    """Get documents from collection, optionally decoded with custom codec options"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db.get_collection(collection_name, codec_options=codec_options).find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+# Aggregation stages that return documents in API shape: a string "id" in place of "_id"
+API_SHAPE_STAGES = [{"$addFields": {"id": {"$toString": "$_id"}}}, {"$project": {"_id": 0}}]
+
+def get_api_documents(collection_name: str, filter_dict: dict = None, limit: int = None, codec_options: CodecOptions = None):
+    """Get documents from collection, reshaped by the server so they need no per-document serialization"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    pipeline = [{"$match": filter_dict or {}}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.extend(API_SHAPE_STAGES)
+
+    return list(db.get_collection(collection_name, codec_options=codec_options).aggregate(pipeline))
@@ -1,20 +1,88 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
+import numpy as np
+import orjson
+from scipy.optimize import linear_sum_assignment
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.coder import Coder
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from pydantic import BaseModel, TypeAdapter
+from pymongo import ReturnDocument, UpdateOne
+from redis import asyncio as aioredis
 
 from schemas import Resident, Staff, Shift, CareTask, CarePlanItem, Event
-from database import create_document, get_documents, db
+from database import ISO_DATETIME_OPTIONS, create_document, create_documents, ensure_indexes, get_api_documents, db, adb
 
 try:
     from bson import ObjectId
 except Exception:  # pragma: no cover
     ObjectId = None
 
-app = FastAPI(title="Healthcare Staff Scheduling & Care Management API")
+logger = logging.getLogger(__name__)
+
+
+class ORJSONCoder(Coder):
+    """Cache coder storing plain orjson bytes, so datetimes come back as the same ISO strings"""
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return orjson.loads(value)
+
+
+# Seconds a cached list response may be served before hitting Mongo again
+LIST_CACHE_TTL = 30
+
+
+async def _clear_list_cache(namespace: str):
+    try:
+        await FastAPICache.clear(namespace=namespace)
+    except Exception as e:
+        # The write already succeeded; a stale list expires after LIST_CACHE_TTL
+        logger.warning("Could not clear %s list cache: %s", namespace, str(e)[:80])
+
+
+async def _build_indexes():
+    try:
+        await run_in_threadpool(ensure_indexes)
+    except Exception as e:
+        # Keep serving; /test reports database problems
+        logger.warning("Could not create indexes: %s", str(e)[:80])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        FastAPICache.init(RedisBackend(aioredis.from_url(redis_url)), prefix="hc", coder=ORJSONCoder)
+    else:
+        # Without Redis the list endpoints are served uncached
+        FastAPICache.init(InMemoryBackend(), prefix="hc", coder=ORJSONCoder, enable=False)
+    # Build indexes in the background so an unreachable Mongo doesn't hold up startup
+    index_task = asyncio.create_task(_build_indexes())
+    yield
+    index_task.cancel()
+
+
+app = FastAPI(
+    title="Healthcare Staff Scheduling & Care Management API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,10 +110,7 @@ def serialize(doc: Dict[str, Any]):
     d = doc.copy()
     if d.get("_id") is not None:
         d["id"] = str(d.pop("_id"))
-    # convert datetimes
-    for k, v in list(d.items()):
-        if isinstance(v, datetime):
-            d[k] = v.isoformat()
+    # datetimes are rendered to ISO-8601 by the response/cache encoders
     return d
 
 
@@ -92,10 +157,9 @@ def test_database():
 # Schema Introspection Endpoint
 # -----------------------------
 
-@app.get("/schema")
-def get_schema():
-    # Expose Pydantic model schemas for the viewer
-    models = {
+# Schemas depend only on the model classes, so build them once at import
+_SCHEMA_CACHE = {
+    "models": {
         "resident": Resident.model_json_schema(),
         "staff": Staff.model_json_schema(),
         "shift": Shift.model_json_schema(),
@@ -103,7 +167,14 @@ def get_schema():
         "careplanitem": CarePlanItem.model_json_schema(),
         "event": Event.model_json_schema(),
     }
-    return {"models": models}
+}
+_SCHEMA_JSON = orjson.dumps(_SCHEMA_CACHE)
+
+
+@app.get("/schema")
+def get_schema():
+    # Expose Pydantic model schemas for the viewer
+    return Response(content=_SCHEMA_JSON, media_type="application/json")
 
 
 # -----------------------------
@@ -111,16 +182,16 @@ def get_schema():
 # -----------------------------
 
 @app.post("/residents")
-def create_resident(payload: Resident):
-    resident_id = create_document("resident", payload)
-    doc = db["resident"].find_one({"_id": oid(resident_id)})
+async def create_resident(payload: Resident):
+    doc = await run_in_threadpool(create_document, "resident", payload)
+    await _clear_list_cache("residents")
     return serialize(doc)
 
 
 @app.get("/residents")
+@cache(expire=LIST_CACHE_TTL, namespace="residents")
 def list_residents():
-    docs = get_documents("resident")
-    return [serialize(d) for d in docs]
+    return get_api_documents("resident", codec_options=ISO_DATETIME_OPTIONS)
 
 
 # -----------------------------
@@ -128,16 +199,16 @@ def list_residents():
 # -----------------------------
 
 @app.post("/staff")
-def create_staff(payload: Staff):
-    staff_id = create_document("staff", payload)
-    doc = db["staff"].find_one({"_id": oid(staff_id)})
+async def create_staff(payload: Staff):
+    doc = await run_in_threadpool(create_document, "staff", payload)
+    await _clear_list_cache("staff")
     return serialize(doc)
 
 
 @app.get("/staff")
+@cache(expire=LIST_CACHE_TTL, namespace="staff")
 def list_staff():
-    docs = get_documents("staff")
-    return [serialize(d) for d in docs]
+    return get_api_documents("staff", codec_options=ISO_DATETIME_OPTIONS)
 
 
 # -----------------------------
@@ -145,16 +216,27 @@ def list_staff():
 # -----------------------------
 
 @app.post("/shifts")
-def create_shift(payload: Shift):
-    shift_id = create_document("shift", payload)
-    doc = db["shift"].find_one({"_id": oid(shift_id)})
+async def create_shift(payload: Shift):
+    doc = await run_in_threadpool(create_document, "shift", payload)
+    await _clear_list_cache("shifts")
     return serialize(doc)
 
 
+# Built once at import so batches validate/dump in a single pydantic-core call
+SHIFT_LIST = TypeAdapter(List[Shift])
+
+
+@app.post("/shifts/bulk")
+async def create_shifts(payload: List[Shift]):
+    docs = await run_in_threadpool(create_documents, "shift", SHIFT_LIST.dump_python(payload))
+    await _clear_list_cache("shifts")
+    return [serialize(d) for d in docs]
+
+
 @app.get("/shifts")
+@cache(expire=LIST_CACHE_TTL, namespace="shifts")
 def list_shifts():
-    docs = get_documents("shift")
-    return [serialize(d) for d in docs]
+    return get_api_documents("shift", codec_options=ISO_DATETIME_OPTIONS)
 
 
 # -----------------------------
@@ -163,8 +245,7 @@ def list_shifts():
 
 @app.post("/tasks")
 def create_task(payload: CareTask):
-    task_id = create_document("caretask", payload)
-    doc = db["caretask"].find_one({"_id": oid(task_id)})
+    doc = create_document("caretask", payload)
     return serialize(doc)
 
 
@@ -175,8 +256,7 @@ def list_tasks(resident_id: Optional[str] = None, staff_id: Optional[str] = None
         filt["resident_id"] = resident_id
     if staff_id:
         filt["assigned_to_staff_id"] = staff_id
-    docs = get_documents("caretask", filt)
-    return [serialize(d) for d in docs]
+    return get_api_documents("caretask", filt, codec_options=ISO_DATETIME_OPTIONS)
 
 
 class TaskStatusUpdate(BaseModel):
@@ -187,10 +267,14 @@ class TaskStatusUpdate(BaseModel):
 def update_task_status(task_id: str, payload: TaskStatusUpdate):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not available")
-    res = db["caretask"].update_one({"_id": oid(task_id)}, {"$set": {"status": payload.status, "updated_at": datetime.utcnow()}})
-    if res.matched_count == 0:
+    # Atomic update-and-read: one round-trip, and no other write can land in between
+    doc = db["caretask"].find_one_and_update(
+        {"_id": oid(task_id)},
+        {"$set": {"status": payload.status, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    doc = db["caretask"].find_one({"_id": oid(task_id)})
     return serialize(doc)
 
 
@@ -202,13 +286,115 @@ class AutoAssignRequest(BaseModel):
     date: Optional[str] = None  # YYYY-MM-DD, if None, use all planned shifts
 
 
-def time_overlap(s1: str, e1: str, s2: str, e2: str) -> bool:
-    return not (e1 <= s2 or e2 <= s1)
+# Finite stand-in for +inf edges; linear_sum_assignment rejects matrices without a full feasible matching
+INFEASIBLE_COST = 1e9
+
+# Matrices with at least this many slot x staff cells go to the auction solver instead of exact LAP.
+# Off (0) by default: scipy's compiled LAP outran the NumPy auction at every size measured.
+AUCTION_THRESHOLD = int(os.getenv("AUCTION_THRESHOLD", "0"))
+
+# Fields the assignment algorithm reads; everything else stays on the server
+SHIFT_ASSIGN_PROJECTION = {"date": 1, "type": 1, "start_time": 1, "end_time": 1, "required_role": 1, "required_count": 1, "assigned_staff_ids": 1, "status": 1}
+STAFF_ASSIGN_PROJECTION = {"role": 1, "preferred_shift": 1, "availability": 1, "max_hours_per_week": 1, "skills": 1}
+
+# Availability day keys in datetime.weekday() order
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_INDEX = {name: i for i, name in enumerate(DAY_NAMES)}
+
+
+def hhmm(value: Any) -> Optional[int]:
+    """Minutes since midnight for an HH:MM string, or None if it is not a valid 24h time."""
+    # Times are plain str in the schemas, so stored records may hold anything
+    if not isinstance(value, str) or len(value) != 5 or value[2] != ":":
+        return None
+    hours, minutes = value[:2], value[3:]
+    if not (hours.isascii() and hours.isdigit() and minutes.isascii() and minutes.isdigit()):
+        return None
+    total = int(hours) * 60 + int(minutes)
+    # "24:00" is accepted as the end of the day
+    if int(minutes) > 59 or total > 1440:
+        return None
+    return total
+
+
+def auction_assignment(benefit: np.ndarray, eps_min: Optional[float] = None):
+    """Bertsekas auction (Jacobi bidding with epsilon scaling) maximising total benefit.
+
+    Rows bid for columns; -inf marks an infeasible edge. Every row also owns a private
+    "unassigned" object priced below any set of real edges, and filler rows that value every
+    object at 0 make the problem square, which epsilon scaling needs to stay optimal.
+    Returns (row, col) for rows matched to a real column.
+    """
+    n, m = benefit.shape
+    finite = np.isfinite(benefit)
+    if not finite.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    lo, hi = benefit[finite].min(), benefit[finite].max()
+    # Like INFEASIBLE_COST for LAP: filling one more row always beats any gain in benefit
+    dummy = lo - (n * (hi - lo) + 1.0)
+    if eps_min is None:
+        eps_min = 0.01 / (n + 1)  # total benefit within 0.01 of optimal
+
+    size = n + m
+    values = np.zeros((size, size))
+    values[:n, :m] = benefit
+    values[:n, m:] = -np.inf
+    values[np.arange(n), m + np.arange(n)] = dummy
+    prices = np.zeros(size)
+    eps = max((hi - dummy) / 4, eps_min)
+    while True:
+        owner = np.full(size, -1)
+        match = np.full(size, -1)
+        bidders = np.arange(size)
+        while bidders.size:
+            net = values[bidders] - prices
+            k = np.arange(bidders.size)
+            best = np.argmax(net, axis=1)
+            best_val = net[k, best]
+            net[k, best] = -np.inf
+            second = net.max(axis=1)
+            # A row left with only its own dummy has no competitor; bid the minimum step
+            second = np.where(np.isfinite(second), second, best_val)
+            bids = prices[best] + (best_val - second) + eps
+
+            # Each object goes to its highest bidder; outbid owners rejoin the pool
+            order = np.lexsort((bids, best))
+            last = np.r_[best[order][1:] != best[order][:-1], True]
+            win = order[last]
+            won = best[win]
+            outbid = owner[won]
+            match[outbid[outbid >= 0]] = -1
+            owner[won] = bidders[win]
+            match[bidders[win]] = won
+            prices[won] = bids[win]
+            bidders = np.flatnonzero(match < 0)
+        if eps <= eps_min:
+            break
+        eps = max(eps / 5, eps_min)
+
+    rows = np.flatnonzero(match[:n] < m)
+    return rows, match[rows]
+
+
+def solve_assignment(cost: np.ndarray):
+    """Min-cost matching of rows to columns over the finite entries of cost; returns (row, col) pairs."""
+    feasible = np.isfinite(cost)
+    if AUCTION_THRESHOLD and cost.size >= AUCTION_THRESHOLD:
+        row, col = auction_assignment(np.where(feasible, -cost, -np.inf))
+    else:
+        row, col = linear_sum_assignment(np.where(feasible, cost, INFEASIBLE_COST))
+    keep = feasible[row, col]
+    return row[keep], col[keep]
+
+
+def shift_duration_hours(start_min: int, end_min: int) -> float:
+    """Shift length in hours; an end at or before the start runs past midnight."""
+    return ((end_min - start_min) % 1440 or 1440) / 60.0
 
 
 @app.post("/assign/auto")
-def auto_assign(req: AutoAssignRequest):
-    if db is None:
+async def auto_assign(req: AutoAssignRequest):
+    if adb is None:
         raise HTTPException(status_code=500, detail="Database not available")
 
     # Fetch planned/published shifts for the date (if provided)
@@ -219,107 +405,157 @@ def auto_assign(req: AutoAssignRequest):
         end_day = start_day.replace(hour=23, minute=59, second=59, microsecond=999999)
         shift_filter["date"] = {"$gte": start_day, "$lte": end_day}
 
-    shifts = list(db["shift"].find(shift_filter))
-    staff = list(db["staff"].find({"is_active": True}))
+    async def fetch_candidate_staff() -> List[Dict[str, Any]]:
+        # Only staff whose role some pending shift needs can be matched; a distinct on the
+        # same filter yields those roles without waiting for the full shift fetch
+        required_roles = await adb["shift"].distinct("required_role", shift_filter)
+        if not required_roles:
+            return []
+        return await adb["staff"].find({"is_active": True, "role": {"$in": required_roles}}, STAFF_ASSIGN_PROJECTION).to_list(None)
+
+    shifts, staff = await asyncio.gather(
+        adb["shift"].find(shift_filter, SHIFT_ASSIGN_PROJECTION).to_list(None),
+        fetch_candidate_staff(),
+    )
+
+    # The matching is CPU-bound; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    open_shifts = await loop.run_in_executor(None, match_open_shifts, shifts, staff)
+
+    # Write all changed shifts in one unordered batch
+    now = datetime.utcnow()
+    ops = []
+    updates = []
+    for sh, original, assigned in open_shifts:
+        if assigned != original:
+            ops.append(UpdateOne({"_id": sh["_id"]}, {"$set": {"assigned_staff_ids": assigned, "status": "published", "updated_at": now}}))
+            updates.append(sh["_id"])  # already an ObjectId
+    modified = (await adb["shift"].bulk_write(ops, ordered=False)).modified_count if ops else 0
+
+    # The writes are done, so the re-read and the cache clear are independent
+    pending = [adb["shift"].find({"_id": {"$in": updates}}).to_list(None)]
+    if modified:
+        pending.append(_clear_list_cache("shifts"))
+    docs, *_ = await asyncio.gather(*pending)
+    by_id = {d["_id"]: d for d in docs}
+    updated_shifts = [serialize(by_id[i]) for i in updates if i in by_id]
+    return {"updated": modified, "shifts": updated_shifts}
+
+
+def match_open_shifts(shifts: List[Dict[str, Any]], staff: List[Dict[str, Any]]) -> List[tuple]:
+    """Fill open shift slots from staff; returns (shift, original_ids, assigned_ids) per open shift."""
+    # Parse shift times once; everything below works on integer minutes.
+    # Missing/malformed times count as 8h and leave the shift unmatchable (_start_min/_end_min None).
+    for sh in shifts:
+        sh["_start_min"] = hhmm(sh.get("start_time"))
+        sh["_end_min"] = hhmm(sh.get("end_time"))
+        if sh["_start_min"] is None or sh["_end_min"] is None:
+            sh["_dur"] = 8.0
+        else:
+            sh["_dur"] = shift_duration_hours(sh["_start_min"], sh["_end_min"])
+        sh["_wd"] = sh["date"].weekday()
 
     # Compute current hours for each staff in the week (simple count by shift duration)
-    staff_hours: Dict[str, float] = {str(s["_id"]): 0.0 for s in staff}
-
-    def shift_duration_hours(sh: Dict[str, Any]) -> float:
-        fmt = "%H:%M"
-        try:
-            st = datetime.strptime(sh.get("start_time"), fmt)
-            en = datetime.strptime(sh.get("end_time"), fmt)
-            diff = (en - st).seconds / 3600
-            if diff <= 0:
-                diff += 24  # handle overnight
-            return diff
-        except Exception:
-            return 8.0
-
-    # Prevent double booking by tracking assignments by time window
-    assignments: Dict[str, List[Dict[str, Any]]] = {}
+    staff_index = {str(s["_id"]): c for c, s in enumerate(staff)}
+    hours = np.zeros(len(staff))
+
+    # Prevent double booking by tracking assigned (staff_idx, date, start, end) windows
+    booked: List[tuple] = []
 
     # Preload existing assignments to avoid overlaps
     existing_assigned = [s for s in shifts if s.get("assigned_staff_ids")]
     for sh in existing_assigned:
         for sid in sh.get("assigned_staff_ids", []):
-            assignments.setdefault(sid, []).append({
-                "date": sh.get("date"),
-                "start": sh.get("start_time"),
-                "end": sh.get("end_time"),
-            })
-            staff_hours[sid] = staff_hours.get(sid, 0.0) + shift_duration_hours(sh)
-
-    # Helper to check availability
-    def is_available(staff_doc: Dict[str, Any], sh: Dict[str, Any]) -> bool:
-        preferred_ok = (staff_doc.get("preferred_shift") in (None, sh.get("type"))) or (staff_doc.get("preferred_shift") is None)
-        day_key = sh.get("date").strftime("%a").lower()[:3]
-        for a in staff_doc.get("availability", []):
-            if a.get("day") == day_key:
-                if a.get("start") <= sh.get("start_time") and a.get("end") >= sh.get("end_time"):
-                    return preferred_ok
-        return False
-
-    # Build a candidate pool per role
-    staff_by_role: Dict[str, List[Dict[str, Any]]] = {}
-    for s in staff:
-        staff_by_role.setdefault(s.get("role"), []).append(s)
+            if sid not in staff_index:
+                continue
+            if sh["_start_min"] is not None and sh["_end_min"] is not None:
+                booked.append((staff_index[sid], sh["date"].toordinal(), sh["_start_min"], sh["_end_min"]))
+            hours[staff_index[sid]] += sh["_dur"]
 
-    updates = []
+    # Only shifts with open slots take part in the matching
+    open_shifts = []
     for sh in shifts:
-        needed = int(sh.get("required_count", 1))
-        role = sh.get("required_role")
-        assigned = sh.get("assigned_staff_ids", [])
-        if len(assigned) >= needed:
-            continue
-
-        candidates = staff_by_role.get(role, [])
-        # Score candidates based on availability, hours left, preferred shift match, skills count
-        scored: List[tuple] = []
-        for s in candidates:
-            sid = str(s["_id"])
-            if not is_available(s, sh):
-                continue
-            # Prevent overlap
-            has_overlap = False
-            for slot in assignments.get(sid, []):
-                if slot.get("date").date() == sh.get("date").date() and time_overlap(slot["start"], slot["end"], sh.get("start_time"), sh.get("end_time")):
-                    has_overlap = True
-                    break
-            if has_overlap:
-                continue
-            hours = staff_hours.get(sid, 0.0)
-            hours_left = max(0.0, float(s.get("max_hours_per_week", 40)) - hours)
-            preferred_bonus = 1.0 if s.get("preferred_shift") == sh.get("type") else 0.0
-            skill_bonus = min(2.0, len(s.get("skills", [])) * 0.1)
-            score = hours_left + preferred_bonus + skill_bonus
-            scored.append((score, s))
-        # Sort by highest score (more hours left first)
-        scored.sort(key=lambda x: x[0], reverse=True)
-
-        for _, s in scored:
-            if len(assigned) >= needed:
-                break
-            sid = str(s["_id"])
-            # Assign
-            assigned.append(sid)
-            assignments.setdefault(sid, []).append({
-                "date": sh.get("date"),
-                "start": sh.get("start_time"),
-                "end": sh.get("end_time"),
-            })
-            staff_hours[sid] = staff_hours.get(sid, 0.0) + shift_duration_hours(sh)
-        if assigned != sh.get("assigned_staff_ids", []):
-            res = db["shift"].update_one({"_id": sh["_id"]}, {"$set": {"assigned_staff_ids": assigned, "status": "published", "updated_at": datetime.utcnow()}})
-            if res.modified_count:
-                updates.append(str(sh["_id"]))
-
-    updated_shifts = [serialize(db["shift"].find_one({"_id": oid(i)})) for i in updates]
-    return {"updated": len(updates), "shifts": updated_shifts}
+        original = sh.get("assigned_staff_ids", [])
+        if len(original) < int(sh.get("required_count", 1)):
+            open_shifts.append((sh, original, list(original)))
+
+    if open_shifts and staff:
+        # Columnar views of staff and open shifts for broadcast feasibility checks
+        staff_role = np.array([s.get("role") or "" for s in staff])
+        staff_pref = np.array([s.get("preferred_shift") or "" for s in staff])
+        max_hours = np.array([float(s.get("max_hours_per_week", 40)) for s in staff])
+        skill_bonus = np.minimum(2.0, np.array([len(s.get("skills", [])) for s in staff]) * 0.1)
+        # Windows with an unknown day or a malformed time can never cover a shift; drop them
+        windows = [(c, DAY_INDEX.get(a.get("day")), hhmm(a.get("start")), hhmm(a.get("end"))) for c, s in enumerate(staff) for a in s.get("availability", [])]
+        avail = np.array([w for w in windows if None not in w], dtype=np.int32).reshape(-1, 4)
+        avail_owner = np.zeros((len(avail), len(staff)), dtype=bool)
+        avail_owner[np.arange(len(avail)), avail[:, 0]] = True
+
+        shift_role = np.array([sh.get("required_role") or "" for sh, _, _ in open_shifts])
+        shift_type = np.array([sh.get("type") or "" for sh, _, _ in open_shifts])
+        shift_day = np.array([sh["_wd"] for sh, _, _ in open_shifts], dtype=np.int16)
+        shift_date = np.array([sh["date"].toordinal() for sh, _, _ in open_shifts], dtype=np.int32)
+        # Shifts with a malformed time are kept (so the output shape is unchanged) but never matched
+        shift_timed = np.array([sh["_start_min"] is not None and sh["_end_min"] is not None for sh, _, _ in open_shifts], dtype=bool)
+        shift_start = np.array([sh["_start_min"] or 0 for sh, _, _ in open_shifts], dtype=np.int16)
+        shift_end = np.array([sh["_end_min"] or 0 for sh, _, _ in open_shifts], dtype=np.int16)
+
+        # Available: staff has a window on that weekday covering the whole shift
+        covers = np.logical_and.reduce([
+            avail[None, :, 1] == shift_day[:, None],
+            avail[None, :, 2] <= shift_start[:, None],
+            avail[None, :, 3] >= shift_end[:, None],
+        ])
+        static_ok = np.logical_and.reduce([
+            shift_role[:, None] == staff_role[None, :],
+            (staff_pref[None, :] == "") | (staff_pref[None, :] == shift_type[:, None]),
+            covers @ avail_owner,
+        ]) & shift_timed[:, None]
+        # Score parts that do not change between rounds: preferred shift match, skills count
+        preferred_bonus = ((staff_pref[None, :] != "") & (staff_pref[None, :] == shift_type[:, None])).astype(float)
+        base_score = preferred_bonus + skill_bonus[None, :]
+
+    # Solve a min-cost bipartite matching between open slots (rows) and staff (columns).
+    # A single solve hands each staff member at most one slot, so re-solve with
+    # refreshed hours/overlaps until no further slot can be filled.
+    while open_shifts and staff:
+        bk = np.array(booked, dtype=np.int32).reshape(-1, 4)
+        bk_owner = np.zeros((len(bk), len(staff)), dtype=bool)
+        bk_owner[np.arange(len(bk)), bk[:, 0]] = True
+        clash = (bk[None, :, 1] == shift_date[:, None]) & (bk[None, :, 3] > shift_start[:, None]) & (shift_end[:, None] > bk[None, :, 2])
+        on_shift = np.zeros_like(static_ok)
+        slot_rows: List[int] = []
+        for i, (sh, _, assigned) in enumerate(open_shifts):
+            for sid in assigned:
+                if sid in staff_index:
+                    on_shift[i, staff_index[sid]] = True
+            slot_rows.extend([i] * (int(sh.get("required_count", 1)) - len(assigned)))
+        if not slot_rows:
+            break
+        feasible_shift = static_ok & ~(clash @ bk_owner) & ~on_shift
+
+        # Score based on hours left plus the static bonuses
+        hours_left = np.maximum(0.0, max_hours - hours)
+        shift_costs = np.where(feasible_shift, -(hours_left[None, :] + base_score), np.inf)
+
+        row, col = solve_assignment(shift_costs[slot_rows])
+        if not row.size:
+            break
+
+        for r, c in zip(row, col):
+            i = slot_rows[r]
+            sh, _, assigned = open_shifts[i]
+            assigned.append(str(staff[c]["_id"]))
+            booked.append((c, shift_date[i], shift_start[i], shift_end[i]))
+            hours[c] += sh["_dur"]
+
+    return open_shifts
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    # loop/http "auto" pick uvloop and httptools whenever they are installed (uvloop is skipped on Windows).
+    # Several workers need the import string; a single worker reuses this module's app instead of importing it again.
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=port, loop="auto", http="auto", workers=workers)